@@ -73,6 +73,27 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Paginated analysis results kept in memory (see tasks/snapshots.py).
+# Snapshots live in one process, so with several server workers a cursor
+# returns 404 unless its requests reach the worker that created it.
+TASK_SNAPSHOT_TTL_SECONDS = 15 * 60
+TASK_SNAPSHOT_MAX_TASKS = 200000
+
+# Memory budget for built blocking indexes kept per process (see
+# tasks/graph.py); measured by the size of their stored closures
+TASK_REACHABILITY_CACHE_BYTES = 64 * 1024 * 1024
+
+# Background analysis jobs (see tasks/jobs.py); larger requests to
+# /api/tasks/analyze/ are queued instead of scored inline. The sync limit
+# targets a 1s response budget: measured end to end through the API,
+# 20k tasks take about 0.55s with the full result (0.35s paged) and 50k
+# take about 1.9s. Job results are paged from chunk files in
+# TASK_JOB_DIR, so their cursors work from any server worker.
+TASK_JOB_DIR = BASE_DIR / 'job_results'
+TASK_JOB_WORKERS = 2
+TASK_JOB_RESULT_TTL_SECONDS = 60 * 60
+TASK_JOB_SYNC_LIMIT = 20000
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 STATIC_URL = '/static/'
@@ -0,0 +1,349 @@
+import threading
+from array import array
+from collections import OrderedDict
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(bits):
+        return bin(bits).count('1')
+
+
+# Closures are stored as runs when 32-bit run bounds beat a bitset
+_RUN_BOUND_BITS = 32
+_BIT_SCAN_RUNS = 16
+_EMPTY_RUNS = array('I')
+
+
+def _closure_nbytes(closure):
+    if isinstance(closure, tuple):
+        return (closure[1].bit_length() + 7) // 8
+    return closure.itemsize * len(closure)
+
+
+class CircularDependencyError(ValueError):
+    """Raised when adding a dependency would create a cycle"""
+
+
+class DependencyGraph:
+    """
+    Dependency graph that rejects cycle-forming edges as they are added.
+
+    An edge dep -> task means "task depends on dep", matching the links
+    emitted by generate_dependency_graph. A topological order is kept up
+    to date (Pearce-Kelly), so an edge that already agrees with the order
+    is accepted in O(1) and only the affected region is searched otherwise.
+    """
+
+    def __init__(self):
+        self.successors = {}    # dep -> set of tasks depending on it
+        self.predecessors = {}  # task -> set of its dependencies
+        self.order = {}         # node -> position in topological order
+        self._next_position = 0
+
+    @classmethod
+    def from_tasks(cls, tasks):
+        """Build a graph from task dicts with 'id' and 'dependencies'"""
+        graph = cls()
+        for task in tasks:
+            task_id = graph._add_vertex(task['id'])
+            for dep_id in task.get('dependencies', []):
+                dep_id = graph._add_vertex(dep_id)
+                if dep_id == task_id:
+                    raise CircularDependencyError(f"Task {task_id} cannot depend on itself")
+                graph.successors[dep_id].add(task_id)
+                graph.predecessors[task_id].add(dep_id)
+
+        # Bulk load: number the nodes with one Kahn pass instead of
+        # reordering edge by edge
+        remaining = {node: len(preds) for node, preds in graph.predecessors.items()}
+        ready = [node for node, count in remaining.items() if count == 0]
+        while ready:
+            node = ready.pop()
+            graph.order[node] = graph._next_position
+            graph._next_position += 1
+            for succ in graph.successors[node]:
+                remaining[succ] -= 1
+                if remaining[succ] == 0:
+                    ready.append(succ)
+        if len(graph.order) < len(graph.successors):
+            raise CircularDependencyError("Circular dependencies detected in tasks")
+        return graph
+
+    def __contains__(self, node):
+        return str(node) in self.order
+
+    def add_node(self, node):
+        node = str(node)
+        if node not in self.order:
+            self.order[node] = self._next_position
+            self._next_position += 1
+            self._add_vertex(node)
+        return node
+
+    def _add_vertex(self, node):
+        # Register adjacency only; the caller assigns the order position
+        node = str(node)
+        if node not in self.successors:
+            self.successors[node] = set()
+            self.predecessors[node] = set()
+        return node
+
+    def remove_node(self, node):
+        node = str(node)
+        if node not in self.order:
+            return
+        for succ in self.successors.pop(node):
+            self.predecessors[succ].discard(node)
+        for pred in self.predecessors.pop(node):
+            self.successors[pred].discard(node)
+        del self.order[node]
+
+    def would_create_cycle(self, task_id, dep_id):
+        """Check whether making task_id depend on dep_id would close a cycle"""
+        task_id, dep_id = str(task_id), str(dep_id)
+        if task_id == dep_id:
+            return True
+        if task_id not in self.order or dep_id not in self.order:
+            return False
+        upper = self.order[dep_id]
+        if self.order[task_id] > upper:
+            return False
+        return self._forward_region(task_id, upper, dep_id) is None
+
+    def add_dependency(self, task_id, dep_id):
+        """Add the edge dep_id -> task_id, raising if it forms a cycle"""
+        task_id, dep_id = str(task_id), str(dep_id)
+        if task_id == dep_id:
+            raise CircularDependencyError(f"Task {task_id} cannot depend on itself")
+        self.add_node(task_id)
+        self.add_node(dep_id)
+        if task_id in self.successors[dep_id]:
+            return
+
+        lower, upper = self.order[task_id], self.order[dep_id]
+        if lower < upper:
+            # Edge goes against the current order; only nodes positioned
+            # between the two endpoints can be involved in a cycle.
+            forward = self._forward_region(task_id, upper, dep_id)
+            if forward is None:
+                raise CircularDependencyError(
+                    f"Adding dependency {dep_id} to task {task_id} creates a cycle"
+                )
+            backward = self._backward_region(dep_id, lower)
+            self._reorder(backward, forward)
+
+        self.successors[dep_id].add(task_id)
+        self.predecessors[task_id].add(dep_id)
+
+    def remove_dependency(self, task_id, dep_id):
+        task_id, dep_id = str(task_id), str(dep_id)
+        if dep_id in self.successors:
+            self.successors[dep_id].discard(task_id)
+        if task_id in self.predecessors:
+            self.predecessors[task_id].discard(dep_id)
+
+    def topological_order(self):
+        """Nodes ordered so every dependency comes before its dependents"""
+        return sorted(self.order, key=self.order.get)
+
+    def _forward_region(self, start, upper, target):
+        # Nodes reachable from start with position <= upper; None if target is hit
+        visited = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for succ in self.successors[node]:
+                if succ == target:
+                    return None
+                if succ not in visited and self.order[succ] < upper:
+                    visited.add(succ)
+                    stack.append(succ)
+        return visited
+
+    def _backward_region(self, start, lower):
+        # Nodes that reach start with position > lower
+        visited = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for pred in self.predecessors[node]:
+                if pred not in visited and self.order[pred] > lower:
+                    visited.add(pred)
+                    stack.append(pred)
+        return visited
+
+    def _reorder(self, backward, forward):
+        # Reuse the affected positions: ancestors of the dependency first,
+        # then descendants of the task, each keeping their relative order.
+        by_position = self.order.get
+        backward = sorted(backward, key=by_position)
+        forward = sorted(forward, key=by_position)
+        positions = sorted(self.order[node] for node in backward + forward)
+        for node, position in zip(backward + forward, positions):
+            self.order[node] = position
+
+
+class ReachabilityIndex:
+    """
+    Transitive closure of a dependency graph, for "how much work does this
+    task block" queries.
+
+    Nodes are numbered in topological order, so everything a node blocks
+    sits at a higher position. Each node's closure is built as an int
+    bitset from its dependents' closures in reverse order, then stored in
+    whichever form is smaller (as roaring bitmaps choose per container):
+    an array of [start, end) runs, which keeps chains and other contiguous
+    closures to a few words, or the bitset with its low zero bits stripped.
+    """
+
+    def __init__(self, graph):
+        self.nodes = graph.topological_order()
+        self.position = {node: i for i, node in enumerate(self.nodes)}
+        self._closure = [_EMPTY_RUNS] * len(self.nodes)
+        self.counts = [0] * len(self.nodes)
+        self.nbytes = 0
+        self._ranking = None
+
+        for i in range(len(self.nodes) - 1, -1, -1):
+            bits = 0
+            for succ in graph.successors[self.nodes[i]]:
+                j = self.position[succ]
+                bits |= (1 << j) | self._bits(j)
+            if bits:
+                self.counts[i] = _popcount(bits)
+                self._closure[i] = self._compress(bits)
+                self.nbytes += _closure_nbytes(self._closure[i])
+
+    @staticmethod
+    def _compress(bits):
+        offset = (bits & -bits).bit_length() - 1
+        bitmap_bits = bits.bit_length() - offset
+        runs = _popcount(bits & ~(bits << 1))
+        if runs * 2 * _RUN_BOUND_BITS >= bitmap_bits:
+            return (offset, bits >> offset)
+        bounds = array('I')
+        if runs <= _BIT_SCAN_RUNS:
+            # Peel runs off the top: the highest zero below a run's end
+            # is where it starts
+            while bits:
+                end = bits.bit_length()
+                below = bits ^ ((1 << end) - 1)
+                start = below.bit_length()
+                bounds.append(end)
+                bounds.append(start)
+                bits = below ^ ((1 << start) - 1)
+        else:
+            # Many runs: one pass over the binary digits is cheaper
+            digits = bin(bits)
+            length = len(digits)
+            i = digits.find('1', 2)
+            while i != -1:
+                j = digits.find('0', i)
+                if j == -1:
+                    j = length
+                bounds.append(length - i)
+                bounds.append(length - j)
+                i = digits.find('1', j)
+        bounds.reverse()
+        return bounds
+
+    def _bits(self, i):
+        closure = self._closure[i]
+        if isinstance(closure, tuple):
+            offset, bits = closure
+            return bits << offset
+        bits = 0
+        for k in range(0, len(closure), 2):
+            start, end = closure[k], closure[k + 1]
+            bits |= ((1 << (end - start)) - 1) << start
+        return bits
+
+    def blocked_count(self, node):
+        """Number of tasks that transitively depend on node"""
+        return self.counts[self.position[str(node)]]
+
+    def blocked_tasks(self, node, start=0, limit=None):
+        """Tasks that transitively depend on node, in topological order"""
+        i = self.position[str(node)]
+        closure, end = self._closure[i], self.counts[i]
+        if limit is not None:
+            end = min(end, start + limit)
+        if start >= end:
+            return []
+        if isinstance(closure, tuple):
+            return [self.nodes[i] for i in self._bitmap_positions(closure, start, end)]
+
+        blocked = []
+        skipped = 0
+        for k in range(0, len(closure), 2):
+            run_start, run_end = closure[k], closure[k + 1]
+            run_length = run_end - run_start
+            if skipped + run_length <= start:
+                skipped += run_length
+                continue
+            first = run_start + max(start - skipped, 0)
+            last = min(run_end, first + end - start - len(blocked))
+            blocked.extend(self.nodes[first:last])
+            skipped += run_length
+            if len(blocked) >= end - start:
+                break
+        return blocked
+
+    @staticmethod
+    def _bitmap_positions(closure, start, end):
+        offset, bits = closure
+        # One pass over the binary digits, lowest bit first; clearing bits
+        # one at a time would copy the whole int per task
+        digits = bin(bits)[:1:-1]
+        positions = []
+        i = digits.find('1')
+        skipped = 0
+        while i != -1 and skipped + len(positions) < end:
+            if skipped < start:
+                skipped += 1
+            else:
+                positions.append(offset + i)
+            i = digits.find('1', i + 1)
+        return positions
+
+    def top_unblockers(self, limit=10):
+        """Nodes whose completion unblocks the most work, as (node, count)"""
+        if self._ranking is None:
+            # Ranked once on first use so later queries are a slice
+            ranked = sorted(range(len(self.nodes)), key=lambda i: (-self.counts[i], i))
+            self._ranking = [i for i in ranked if self.counts[i]]
+        return [(self.nodes[i], self.counts[i]) for i in self._ranking[:limit]]
+
+
+class ReachabilityIndexCache:
+    """
+    LRU of built ReachabilityIndex objects keyed by a hash of the graph
+    they were built from, so repeated queries skip the build. Entries are
+    evicted once their closures exceed max_bytes in total; an index that
+    alone is over budget is not cached.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (nbytes, value)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= self._entries.pop(key)[0]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (nbytes, value)
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                self._nbytes -= self._entries.popitem(last=False)[1][0]
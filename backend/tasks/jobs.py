@@ -0,0 +1,364 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from .graph import CircularDependencyError, DependencyGraph
+from .scoring import rank_tasks
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobNotFound(LookupError):
+    """Raised when a job id is unknown or its result has expired"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when cancellation has been requested"""
+
+
+RESULT_CHUNK_SIZE = 1000
+
+
+class JobStore:
+    """
+    Filesystem store for job state, shared by the web process and workers.
+
+    Each job has <id>.json with its status and progress, written when the
+    job is queued and afterwards only by its worker. The final status goes
+    to <id>.outcome.json, which is created exactly once: whichever of the
+    worker, a cancel or the staleness check finishes the job first wins,
+    and later attempts are ignored. Results are stored as <id>.result.json
+    metadata plus <id>.result.<n>.json chunks of RESULT_CHUNK_SIZE tasks,
+    so a page only reads the chunks it covers. An <id>.cancel marker
+    requests cancellation. Files are replaced atomically so readers never
+    see a partial write.
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, job_id, suffix='.json'):
+        # Job ids are generated hex strings; reject anything else so a
+        # request cannot point outside the store
+        if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+            raise JobNotFound("Job not found")
+        return os.path.join(self.directory, job_id + suffix)
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, default=lambda value: value.isoformat())
+        os.replace(tmp_path, path)
+
+    def _write_once(self, path, data):
+        # Linking fails if path exists, so only the first writer succeeds
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        try:
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def _read(self, path, error):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise JobNotFound(error)
+
+    def create(self, job_id, **fields):
+        job = {
+            "id": job_id,
+            "status": QUEUED,
+            "phase": None,
+            "progress": 0,
+            "total": 0,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        job.update(fields)
+        self._write(self._path(job_id), job)
+        return job
+
+    def get(self, job_id):
+        job = self._read(self._path(job_id), "Job not found")
+        try:
+            with open(self._path(job_id, '.outcome.json')) as f:
+                job.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        return job
+
+    def update(self, job_id, **fields):
+        """Record progress; only the job's worker calls this once it runs"""
+        job = self._read(self._path(job_id), "Job not found")
+        job.update(fields)
+        self._write(self._path(job_id), job)
+
+    def finish(self, job_id, status, **fields):
+        """Set the final status unless the job has already finished"""
+        outcome = dict(fields, status=status, finished_at=time.time())
+        return self._write_once(self._path(job_id, '.outcome.json'), outcome)
+
+    def write_result(self, job_id, tasks, **metadata):
+        for n, start in enumerate(range(0, len(tasks), RESULT_CHUNK_SIZE)):
+            self._write(
+                self._path(job_id, f'.result.{n}.json'), tasks[start:start + RESULT_CHUNK_SIZE]
+            )
+        metadata.update(total_tasks=len(tasks), chunk_size=RESULT_CHUNK_SIZE)
+        self._write(self._path(job_id, '.result.json'), metadata)
+
+    def read_result_page(self, job_id, offset, limit):
+        """Return (tasks, total, metadata), reading only the chunks needed"""
+        metadata = self._read(self._path(job_id, '.result.json'), "Job result not found")
+        chunk_size, total = metadata['chunk_size'], metadata['total_tasks']
+        end = min(offset + limit, total)
+        tasks = []
+        n = offset // chunk_size
+        while offset + len(tasks) < end:
+            chunk = self._read(self._path(job_id, f'.result.{n}.json'), "Job result not found")
+            start = max(offset - n * chunk_size, 0)
+            tasks.extend(chunk[start:start + end - offset - len(tasks)])
+            n += 1
+        return tasks, total, metadata
+
+    def iter_result(self, job_id):
+        """
+        Return an iterator over the full result as JSON text. Chunks are
+        copied as stored rather than parsed, so memory stays at one chunk.
+        """
+        metadata = self._read(self._path(job_id, '.result.json'), "Job result not found")
+        chunk_count = -(-metadata['total_tasks'] // metadata['chunk_size'])
+        head = {key: value for key, value in metadata.items() if key != 'chunk_size'}
+
+        def generate():
+            yield json.dumps(head)[:-1] + ', "tasks": ['
+            for n in range(chunk_count):
+                with open(self._path(job_id, f'.result.{n}.json')) as f:
+                    chunk = f.read()
+                yield (', ' if n else '') + chunk[1:-1]
+            yield ']}'
+
+        return generate()
+
+    def request_cancel(self, job_id):
+        open(self._path(job_id, '.cancel'), 'w').close()
+
+    def cancel_requested(self, job_id):
+        return os.path.exists(self._path(job_id, '.cancel'))
+
+    def delete(self, job_id):
+        for suffix in ('.json', '.outcome.json', '.result.json', '.cancel'):
+            try:
+                os.remove(self._path(job_id, suffix))
+            except FileNotFoundError:
+                pass
+        # Chunks are numbered from 0 without gaps
+        n = 0
+        while True:
+            try:
+                os.remove(self._path(job_id, f'.result.{n}.json'))
+            except FileNotFoundError:
+                break
+            n += 1
+
+    def fail_if_stale(self, job, ttl):
+        """
+        Mark a job that has not finished within ttl seconds of creation as
+        failed, e.g. because its worker died without reporting back
+        """
+        if job['finished_at'] is None and job['created_at'] < time.time() - ttl:
+            self.request_cancel(job['id'])
+            self.finish(job['id'], FAILED, error="Job did not finish in time")
+            return self.get(job['id'])
+        return job
+
+    def purge_expired(self, ttl):
+        """Remove finished jobs older than ttl seconds and fail stale ones"""
+        cutoff = time.time() - ttl
+        for name in os.listdir(self.directory):
+            # Only <id>.json; results, outcomes and temp files have more dots
+            if not name.endswith('.json') or name.count('.') != 1:
+                continue
+            job_id = name[:-len('.json')]
+            try:
+                job = self.fail_if_stale(self.get(job_id), ttl)
+            except (JobNotFound, ValueError):
+                continue
+            if job['finished_at'] is not None and job['finished_at'] < cutoff:
+                self.delete(job_id)
+
+
+def run_analysis_job(directory, job_id, tasks_data, strategy):
+    """Worker entry point: score the tasks and store the ranked result"""
+    store = JobStore(directory)
+
+    def enter_phase(phase):
+        # Cancellation is checked between phases and, while scoring, on
+        # every progress report
+        if store.cancel_requested(job_id):
+            raise JobCancelled()
+        store.update(job_id, status=RUNNING, phase=phase)
+
+    def progress(done, total):
+        if store.cancel_requested(job_id):
+            raise JobCancelled()
+        store.update(job_id, progress=done)
+
+    try:
+        enter_phase('validating')
+        # Iterative check, so very deep dependency chains cannot hit the
+        # recursion limit of detect_circular_dependencies
+        try:
+            DependencyGraph.from_tasks(tasks_data)
+        except CircularDependencyError:
+            store.finish(job_id, FAILED, error="Circular dependencies detected in tasks")
+            return
+
+        enter_phase('scoring')
+        sorted_tasks = rank_tasks(tasks_data, strategy, progress=progress)
+        enter_phase('saving')
+        store.write_result(job_id, sorted_tasks, strategy_used=strategy)
+        store.finish(job_id, COMPLETED, progress=len(sorted_tasks))
+    except JobCancelled:
+        store.finish(job_id, CANCELLED)
+    except Exception as e:
+        store.finish(job_id, FAILED, error=str(e))
+
+
+class JobQueue:
+    """
+    Runs analyses in a local worker pool, keeping state in a JobStore.
+
+    Workers are separate processes, so large analyses do not hold the
+    request worker or the GIL. Finished jobs expire after result_ttl
+    seconds; jobs that never finish are failed once that old.
+    """
+
+    def __init__(self, directory, max_workers=2, result_ttl=3600, executor_class=ProcessPoolExecutor):
+        self.store = JobStore(directory)
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self.executor_class = executor_class
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self.executor_class(max_workers=self.max_workers)
+            return self._executor
+
+    def _discard_executor(self, executor):
+        # A pool whose worker died is unusable; the next submit starts a new one
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def submit(self, tasks_data, strategy):
+        self.store.purge_expired(self.result_ttl)
+        job_id = uuid.uuid4().hex
+        job = self.store.create(job_id, strategy=strategy, total=len(tasks_data))
+        executor = self._get_executor()
+        try:
+            future = executor.submit(
+                run_analysis_job, self.store.directory, job_id, tasks_data, strategy
+            )
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            future = executor.submit(
+                run_analysis_job, self.store.directory, job_id, tasks_data, strategy
+            )
+        self._futures[job_id] = future
+        future.add_done_callback(lambda done: self._record_outcome(job_id, done, executor))
+        return job
+
+    def _record_outcome(self, job_id, future, executor):
+        # Workers report their own status; this catches the failures they
+        # cannot report, such as a killed process or unpicklable arguments
+        self._futures.pop(job_id, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            return
+        if isinstance(error, BrokenProcessPool) and executor is not None:
+            self._discard_executor(executor)
+        try:
+            self.store.finish(job_id, FAILED, error=f"Worker failed: {error!r}")
+        except JobNotFound:
+            pass
+
+    def status(self, job_id):
+        job = self.store.fail_if_stale(self.store.get(job_id), self.result_ttl)
+        if job['finished_at'] is not None and job['finished_at'] < time.time() - self.result_ttl:
+            self.store.delete(job_id)
+            raise JobNotFound("Job not found")
+        return job
+
+    def result_page(self, job_id, offset, limit):
+        self.status(job_id)
+        return self.store.read_result_page(job_id, offset, limit)
+
+    def iter_result(self, job_id):
+        self.status(job_id)
+        return self.store.iter_result(job_id)
+
+    def cancel(self, job_id):
+        job = self.status(job_id)
+        if job['status'] in FINISHED_STATUSES:
+            return job
+        self.store.request_cancel(job_id)
+        # Jobs still waiting in this process's pool never reach a worker
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self.store.finish(job_id, CANCELLED)
+        return self.store.get(job_id)
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job submitted from this process finishes"""
+        future = self._futures.get(job_id)
+        if future is not None:
+            wait([future], timeout)
+            if future.done():
+                # Done callbacks run after waiters wake; record it here too
+                self._record_outcome(job_id, future, None)
+        return self.status(job_id)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_job_queue = None
+
+
+def get_job_queue():
+    global _job_queue
+    if _job_queue is None:
+        from django.conf import settings
+        _job_queue = JobQueue(
+            getattr(settings, 'TASK_JOB_DIR', os.path.join(settings.BASE_DIR, 'job_results')),
+            max_workers=getattr(settings, 'TASK_JOB_WORKERS', 2),
+            result_ttl=getattr(settings, 'TASK_JOB_RESULT_TTL_SECONDS', 3600),
+        )
+    return _job_queue
@@ -1,5 +1,151 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, router, transaction
+from django.db.models import F
+from collections import OrderedDict
+import threading
 import uuid
+from .graph import CircularDependencyError, DependencyGraph
+
+# In-process copies of the stored dependency graph, keyed by the token of
+# the DependencyGraphVersion row they reflect. Every write that changes the
+# graph stores a fresh random token, so a token names exactly one database
+# state: a graph cached for an uncommitted token is reused by later edits
+# in the same transaction, is invisible to other connections until commit,
+# and is never matched again if the transaction rolls back.
+_graph_cache = OrderedDict()  # token -> DependencyGraph
+_graph_lock = threading.Lock()
+_GRAPH_CACHE_ENTRIES = 2
+
+
+def _stored_graph_token():
+    token = DependencyGraphVersion.objects.filter(pk=1).values_list('token', flat=True).first()
+    return token or ''
+
+
+def _bump_graph_version(expected_token=None):
+    """
+    Store a new graph token inside the current transaction and return it.
+    The UPDATE takes the row (SQLite: database) write lock, so concurrent
+    dependency edits are serialized until commit. With expected_token, the
+    bump only succeeds if nobody changed the graph since that token was
+    read; None is returned otherwise.
+    """
+    token = uuid.uuid4().hex
+    rows = DependencyGraphVersion.objects.filter(pk=1)
+    if expected_token is not None:
+        rows = rows.filter(token=expected_token)
+    if rows.update(version=F('version') + 1, token=token):
+        return token
+    if expected_token is not None:
+        return None
+    DependencyGraphVersion.objects.get_or_create(pk=1)
+    DependencyGraphVersion.objects.filter(pk=1).update(version=F('version') + 1, token=token)
+    return token
+
+
+def _load_dependency_graph():
+    try:
+        return DependencyGraph.from_tasks(Task.objects.values('id', 'dependencies'))
+    except CircularDependencyError as e:
+        raise ValidationError(str(e))
+
+
+def _take_dependency_graph(token):
+    """
+    Remove and return the graph for token, loading it if it is not cached.
+    The caller owns it until it installs it under the token it then reflects.
+    """
+    with _graph_lock:
+        graph = _graph_cache.pop(token, None)
+    if graph is None:
+        graph = _load_dependency_graph()
+    return graph
+
+
+def _install_dependency_graph(graph, token):
+    with _graph_lock:
+        _graph_cache[token] = graph
+        _graph_cache.move_to_end(token)
+        while len(_graph_cache) > _GRAPH_CACHE_ENTRIES:
+            _graph_cache.popitem(last=False)
+
+
+def _lock_graph_for_write(token):
+    """
+    Bump the version for a dependency write and return (graph, new_token).
+    The graph read under token is reused unless another writer committed
+    in between, in which case it is reloaded under the lock.
+    """
+    graph = _take_dependency_graph(token)
+    new_token = _bump_graph_version(expected_token=token)
+    if new_token is None:
+        new_token = _bump_graph_version()
+        graph = _load_dependency_graph()
+    return graph, new_token
+
+
+def get_dependency_graph():
+    """Return the dependency graph of stored tasks, reloading it if stale"""
+    token = _stored_graph_token()
+    with _graph_lock:
+        graph = _graph_cache.get(token)
+    if graph is None:
+        graph = _load_dependency_graph()
+        _install_dependency_graph(graph, token)
+    return graph
+
+
+def reset_dependency_graph():
+    with _graph_lock:
+        _graph_cache.clear()
+
+
+class DependencyGraphVersion(models.Model):
+    """Single row bumped by every write that changes task dependencies"""
+    version = models.BigIntegerField(default=0)
+    token = models.CharField(max_length=32, default='')
+
+
+class TaskQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        if 'dependencies' not in kwargs:
+            return super().update(**kwargs)
+        # Arbitrary rows change at once, so validate the reloaded graph
+        with transaction.atomic(using=self.db):
+            token = _bump_graph_version()
+            rows = super().update(**kwargs)
+            _install_dependency_graph(_load_dependency_graph(), token)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+                # The database decides which rows are skipped or upserted,
+                # so validate the reloaded graph as update() does
+                token = _bump_graph_version()
+                result = super().bulk_create(objs, *args, **kwargs)
+                _install_dependency_graph(_load_dependency_graph(), token)
+                return result
+
+            graph, token = _lock_graph_for_write(_stored_graph_token())
+            with _graph_lock:
+                try:
+                    for obj in objs:
+                        graph.add_node(obj.id)
+                        for dep_id in obj.dependencies:
+                            graph.add_dependency(obj.id, dep_id)
+                except CircularDependencyError as e:
+                    raise ValidationError(str(e))
+            result = super().bulk_create(objs, *args, **kwargs)
+            _install_dependency_graph(graph, token)
+        return result
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            _bump_graph_version()
+            return super().delete()
+
 
 class Task(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -9,9 +155,99 @@ class Task(models.Model):
     importance = models.IntegerField()  # 1-10 scale
     dependencies = models.JSONField(default=list)  # list of task IDs
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    objects = TaskQuerySet.as_manager()
+
     def __str__(self):
         return self.title
-    
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'dependencies' not in update_fields:
+            return super().save(*args, **kwargs)
+
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            token = _stored_graph_token()
+            graph = _take_dependency_graph(token)
+            wanted = {str(dep) for dep in self.dependencies}
+            if wanted == graph.predecessors.get(str(self.id), set()):
+                # Dependencies unchanged: leave the version alone, and skip
+                # the column so a stale view can never overwrite it
+                if self._state.adding:
+                    with _graph_lock:
+                        graph.add_node(self.id)
+                _install_dependency_graph(graph, token)
+                if not self._state.adding:
+                    kwargs['update_fields'] = [
+                        f.name for f in self._meta.concrete_fields
+                        if not f.primary_key and f.name != 'dependencies'
+                        and (update_fields is None or f.name in update_fields)
+                    ]
+                    if not kwargs['update_fields']:
+                        return
+                return super().save(*args, **kwargs)
+
+            _install_dependency_graph(graph, token)
+            graph, token = _lock_graph_for_write(token)
+            with _graph_lock:
+                self._apply_dependencies(graph)
+            super().save(*args, **kwargs)
+            _install_dependency_graph(graph, token)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            graph, token = _lock_graph_for_write(_stored_graph_token())
+            with _graph_lock:
+                graph.remove_node(self.id)
+            result = super().delete(*args, **kwargs)
+            _install_dependency_graph(graph, token)
+        return result
+
+    def add_dependency(self, task_id, save=True):
+        """
+        Make this task depend on task_id. Raises ValidationError when the
+        new edge would create a circular dependency; only the part of the
+        graph between the two tasks is searched, not the whole graph.
+        """
+        task_id = str(task_id)
+        if task_id in self.dependencies:
+            return
+        # Fast rejection; save() repeats the check under the version lock
+        graph = get_dependency_graph()
+        with _graph_lock:
+            creates_cycle = graph.would_create_cycle(self.id, task_id)
+        if creates_cycle:
+            raise ValidationError(
+                f"Adding dependency {task_id} to task {self.id} creates a cycle"
+            )
+        self.dependencies = self.dependencies + [task_id]
+        if save:
+            try:
+                self.save(update_fields=['dependencies'])
+            except ValidationError:
+                self.dependencies = [dep for dep in self.dependencies if dep != task_id]
+                raise
+
+    def remove_dependency(self, task_id, save=True):
+        task_id = str(task_id)
+        self.dependencies = [dep for dep in self.dependencies if dep != task_id]
+        if save:
+            self.save(update_fields=['dependencies'])
+
+    def _apply_dependencies(self, graph):
+        # On a cycle the caller drops this graph, so no undo is needed
+        node = graph.add_node(self.id)
+        wanted = {str(dep) for dep in self.dependencies}
+        current = set(graph.predecessors[node])
+        for dep_id in current - wanted:
+            graph.remove_dependency(node, dep_id)
+        try:
+            for dep_id in wanted - current:
+                graph.add_dependency(node, dep_id)
+        except CircularDependencyError as e:
+            raise ValidationError(str(e))
+
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
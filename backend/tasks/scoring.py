@@ -1,5 +1,8 @@
 from datetime import date, timedelta
 import math
+import time
+
+MAX_BLOCKING_COUNT = 3
 
 class TaskScorer:
     def __init__(self, strategy="smart_balance"):
@@ -51,27 +54,52 @@ class TaskScorer:
         else:
             return max(0.1, 1.0 / math.sqrt(estimated_hours))
     
-    def calculate_dependency_score(self, dependencies, all_tasks):
+    def calculate_dependency_score(self, dependencies, all_tasks, dependents=None):
         if not dependencies:
             return 0.5  # Neutral score for no dependencies
         
         # Tasks that block others get higher priority
-        blocking_count = 0
-        for task in all_tasks:
-            if any(dep in task.get('dependencies', []) for dep in dependencies):
-                blocking_count += 1
+        if dependents is None:
+            blocking_count = 0
+            for task in all_tasks:
+                if any(dep in task.get('dependencies', []) for dep in dependencies):
+                    blocking_count += 1
+        else:
+            blocking_count = self._count_sharing_tasks(dependencies, dependents)
         
         # Increased base score and multiplier to ensure score > 0.5 when blocking
         return min(1.0, 0.5 + (blocking_count * 0.2))
     
-    def calculate_total_score(self, task, all_tasks, today=None):
+    @staticmethod
+    def build_dependents_index(all_tasks):
+        """Map each dependency id to the positions of tasks that list it"""
+        dependents = {}
+        for position, task in enumerate(all_tasks):
+            for dep in set(task.get('dependencies', [])):
+                dependents.setdefault(dep, []).append(position)
+        return dependents
+    
+    def _count_sharing_tasks(self, dependencies, dependents):
+        # Same count as the full scan, but it stops once the score is
+        # saturated: 0.5 + MAX_BLOCKING_COUNT * 0.2 already reaches 1.0
+        seen = set()
+        for dep in dependencies:
+            for position in dependents.get(dep, ()):
+                seen.add(position)
+                if len(seen) >= MAX_BLOCKING_COUNT:
+                    return MAX_BLOCKING_COUNT
+        return len(seen)
+    
+    def calculate_total_score(self, task, all_tasks, today=None, dependents=None):
         if today is None:
             today = date.today()
         
         urgency_score = self.calculate_urgency_score(task['due_date'], today)
         importance_score = self.calculate_importance_score(task['importance'])
         effort_score = self.calculate_effort_score(task['estimated_hours'])
-        dependency_score = self.calculate_dependency_score(task.get('dependencies', []), all_tasks)
+        dependency_score = self.calculate_dependency_score(
+            task.get('dependencies', []), all_tasks, dependents
+        )
         
         # Calculate weighted score
         total_score = (
@@ -116,6 +144,35 @@ class TaskScorer:
             
         return f"Priority due to: {', '.join(factors)} (score: {total_score:.3f})"
 
+VALID_STRATEGIES = ['smart_balance', 'fastest_wins', 'high_impact', 'deadline_driven']
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+def rank_tasks(tasks, strategy, today=None, progress=None):
+    """
+    Score tasks with the given strategy and return them sorted by priority.
+    Dependents are indexed once, so scoring is linear in tasks plus
+    dependencies. progress(done, total) is called about every
+    PROGRESS_INTERVAL_SECONDS and may raise to abort.
+    """
+    if today is None:
+        today = date.today()
+    
+    scorer = TaskScorer(strategy)
+    dependents = scorer.build_dependents_index(tasks)
+    total = len(tasks)
+    last_report = time.monotonic()
+    if progress is not None:
+        progress(0, total)
+    for i, task in enumerate(tasks):
+        if progress is not None and time.monotonic() - last_report >= PROGRESS_INTERVAL_SECONDS:
+            progress(i, total)
+            last_report = time.monotonic()
+        score, explanation = scorer.calculate_total_score(task, tasks, today, dependents)
+        task['priority_score'] = score
+        task['explanation'] = explanation
+    
+    return sorted(tasks, key=lambda x: x['priority_score'], reverse=True)
+
 def detect_circular_dependencies(tasks):
     """Detect circular dependencies in tasks"""
     graph = {}
@@ -0,0 +1,109 @@
+import base64
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+
+DEFAULT_TTL_SECONDS = 15 * 60
+DEFAULT_MAX_TASKS = 200000
+
+
+class SnapshotNotFound(LookupError):
+    """Raised when a snapshot id or cursor is unknown or has expired"""
+
+
+class SnapshotTooLarge(Exception):
+    """Raised when a ranking alone exceeds the store's task budget"""
+
+
+def encode_cursor(snapshot_id, offset):
+    raw = f"{snapshot_id}:{offset}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        snapshot_id, offset = base64.urlsafe_b64decode(padded).decode().split(':')
+        offset = int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise SnapshotNotFound("Invalid cursor")
+    if offset < 0:
+        raise SnapshotNotFound("Invalid cursor")
+    return snapshot_id, offset
+
+
+class SnapshotStore:
+    """
+    In-memory store of ranked analysis results.
+
+    Each snapshot keeps the already sorted task list so later pages are
+    sliced from it without rescoring. Snapshots expire after ttl seconds,
+    and the least recently used ones are evicted once the total number of
+    stored tasks exceeds max_tasks.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, max_tasks=DEFAULT_MAX_TASKS):
+        self.ttl = ttl
+        self.max_tasks = max_tasks
+        self._snapshots = OrderedDict()  # id -> (expires_at, metadata, tasks)
+        self._task_count = 0
+        self._lock = threading.Lock()
+
+    def create(self, tasks, page_size, **metadata):
+        """
+        Store tasks as a new snapshot and return (snapshot_id, first_page).
+        The first page is read under the same lock, so a concurrent create
+        or a short ttl cannot evict the snapshot before it is returned.
+        Raises SnapshotTooLarge if tasks alone exceed max_tasks.
+        """
+        if len(tasks) > self.max_tasks:
+            raise SnapshotTooLarge(f"{len(tasks)} tasks exceed the snapshot budget")
+        snapshot_id = uuid.uuid4().hex
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._snapshots[snapshot_id] = (now + self.ttl, metadata, tasks)
+            self._task_count += len(tasks)
+            while self._task_count > self.max_tasks:
+                self._evict(next(iter(self._snapshots)))
+            return snapshot_id, self._page(snapshot_id, 0, page_size)
+
+    def page(self, snapshot_id, offset, limit):
+        """Return (tasks, next_cursor, total, metadata) for one page"""
+        with self._lock:
+            self._expire(time.monotonic())
+            if snapshot_id not in self._snapshots:
+                raise SnapshotNotFound("Snapshot not found or expired")
+            self._snapshots.move_to_end(snapshot_id)
+            return self._page(snapshot_id, offset, limit)
+
+    def _page(self, snapshot_id, offset, limit):
+        _, metadata, tasks = self._snapshots[snapshot_id]
+        end = offset + limit
+        next_cursor = encode_cursor(snapshot_id, end) if end < len(tasks) else None
+        return tasks[offset:end], next_cursor, len(tasks), metadata
+
+    def delete(self, snapshot_id):
+        with self._lock:
+            if snapshot_id in self._snapshots:
+                self._evict(snapshot_id)
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def _expire(self, now):
+        expired = [key for key, (expires_at, _, _) in self._snapshots.items() if expires_at <= now]
+        for snapshot_id in expired:
+            self._evict(snapshot_id)
+
+    def _evict(self, snapshot_id):
+        _, _, tasks = self._snapshots.pop(snapshot_id)
+        self._task_count -= len(tasks)
+
+
+snapshot_store = SnapshotStore(
+    ttl=getattr(settings, 'TASK_SNAPSHOT_TTL_SECONDS', DEFAULT_TTL_SECONDS),
+    max_tasks=getattr(settings, 'TASK_SNAPSHOT_MAX_TASKS', DEFAULT_MAX_TASKS),
+)
@@ -1,6 +1,9 @@
+import os
 from django.test import TestCase
 from datetime import date, timedelta
 from .scoring import TaskScorer, detect_circular_dependencies
+from .graph import CircularDependencyError, DependencyGraph, ReachabilityIndex
+from .snapshots import SnapshotNotFound, SnapshotStore, SnapshotTooLarge, decode_cursor
 
 class TaskScoringTests(TestCase):
     
@@ -74,6 +77,21 @@ class TaskScoringTests(TestCase):
         self.assertIsInstance(explanation, str)
         self.assertIn("score:", explanation)
     
+    def test_indexed_dependency_score_matches_full_scan(self):
+        import random
+        rng = random.Random(3)
+        tasks = [
+            {"id": str(i), "dependencies": [str(rng.randrange(8)) for _ in range(rng.randrange(4))]}
+            for i in range(40)
+        ]
+        scorer = TaskScorer()
+        dependents = scorer.build_dependents_index(tasks)
+        for task in tasks:
+            self.assertEqual(
+                scorer.calculate_dependency_score(task["dependencies"], tasks, dependents),
+                scorer.calculate_dependency_score(task["dependencies"], tasks)
+            )
+    
     def test_different_strategies(self):
         strategies = ["smart_balance", "fastest_wins", "high_impact", "deadline_driven"]
         
@@ -126,6 +144,10 @@ class TaskScoringTests(TestCase):
         self.assertLessEqual(score_max, 1.0)
 
 class TaskModelTests(TestCase):
+    def setUp(self):
+        from .models import reset_dependency_graph
+        reset_dependency_graph()
+    
     def test_task_creation(self):
         from .models import Task
         task = Task.objects.create(
@@ -137,4 +159,622 @@ class TaskModelTests(TestCase):
         )
         self.assertEqual(task.title, "Test Task")
         self.assertEqual(task.importance, 8)
-        self.assertEqual(len(task.dependencies), 2)
\ No newline at end of file
+        self.assertEqual(len(task.dependencies), 2)
+    
+    def test_add_dependency_rejects_cycle(self):
+        from django.core.exceptions import ValidationError
+        from .models import Task
+        first = Task.objects.create(
+            title="First", due_date=date.today(), estimated_hours=1, importance=5
+        )
+        second = Task.objects.create(
+            title="Second", due_date=date.today(), estimated_hours=1, importance=5
+        )
+        second.add_dependency(first.id)
+        self.assertEqual(Task.objects.get(id=second.id).dependencies, [str(first.id)])
+        
+        with self.assertRaises(ValidationError):
+            first.add_dependency(second.id)
+        self.assertEqual(Task.objects.get(id=first.id).dependencies, [])
+        
+        second.remove_dependency(first.id)
+        first.add_dependency(second.id)
+        self.assertEqual(Task.objects.get(id=first.id).dependencies, [str(second.id)])
+    
+    def _create(self, title, dependencies=None):
+        from .models import Task
+        return Task.objects.create(
+            title=title, due_date=date.today(), estimated_hours=1, importance=5,
+            dependencies=dependencies or []
+        )
+    
+    def test_rolled_back_dependency_leaves_no_edge(self):
+        from django.db import transaction
+        first, second = self._create("First"), self._create("Second")
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                second.add_dependency(first.id)
+                raise RuntimeError("rollback")
+        first.add_dependency(second.id)
+        self.assertEqual(first.dependencies, [str(second.id)])
+    
+    def test_committed_graph_is_cached_and_reloaded_when_stale(self):
+        from django.core.exceptions import ValidationError
+        from .models import DependencyGraphVersion, Task, get_dependency_graph
+        first, second = self._create("First"), self._create("Second")
+        second.add_dependency(first.id)
+        self.assertIs(get_dependency_graph(), get_dependency_graph())
+        
+        # A queryset update bypasses save() but still bumps the version
+        Task.objects.filter(id=second.id).update(dependencies=[])
+        self.assertEqual(get_dependency_graph().predecessors[str(second.id)], set())
+        first.add_dependency(second.id)
+        with self.assertRaises(ValidationError):
+            Task.objects.get(id=second.id).add_dependency(first.id)
+        self.assertGreater(DependencyGraphVersion.objects.get(pk=1).version, 0)
+    
+    def test_bulk_writes_are_validated(self):
+        from django.core.exceptions import ValidationError
+        from .models import Task
+        first = self._create("First")
+        second = self._create("Second", [str(first.id)])
+        with self.assertRaises(ValidationError):
+            Task.objects.filter(id=first.id).update(dependencies=[str(second.id)])
+        self.assertEqual(Task.objects.get(id=first.id).dependencies, [])
+        
+        third = Task(title="Third", due_date=date.today(), estimated_hours=1, importance=5)
+        third.dependencies = [str(third.id)]
+        with self.assertRaises(ValidationError):
+            Task.objects.bulk_create([third])
+        self.assertFalse(Task.objects.filter(id=third.id).exists())
+    
+    def test_edits_in_one_transaction_reuse_the_graph(self):
+        from unittest import mock
+        from django.db import transaction
+        from . import models
+        tasks = [self._create(f"Task {i}") for i in range(10)]
+        with mock.patch.object(
+            models, '_load_dependency_graph', wraps=models._load_dependency_graph
+        ) as load:
+            with transaction.atomic():
+                for dependent, dep in zip(tasks[1:], tasks):
+                    dependent.add_dependency(dep.id)
+        self.assertLessEqual(load.call_count, 1)
+        self.assertEqual(
+            models.get_dependency_graph().predecessors[str(tasks[9].id)], {str(tasks[8].id)}
+        )
+    
+    def test_save_without_dependency_change_keeps_version(self):
+        from .models import DependencyGraphVersion, Task
+        first = self._create("First")
+        second = self._create("Second", [str(first.id)])
+        version = DependencyGraphVersion.objects.get(pk=1).version
+        second.title = "Renamed"
+        second.save()
+        self.assertEqual(DependencyGraphVersion.objects.get(pk=1).version, version)
+        self.assertEqual(Task.objects.get(id=second.id).title, "Renamed")
+    
+    def test_bulk_create_with_conflicts_reloads_graph(self):
+        from .models import Task, get_dependency_graph
+        first = self._create("First")
+        second = self._create("Second", [str(first.id)])
+        duplicate = Task(
+            id=second.id, title="Second", due_date=date.today(), estimated_hours=1,
+            importance=5, dependencies=[]
+        )
+        Task.objects.bulk_create([duplicate], ignore_conflicts=True)
+        self.assertEqual(get_dependency_graph().predecessors[str(second.id)], {str(first.id)})
+
+class DependencyGraphTests(TestCase):
+    def test_edges_in_order_are_accepted(self):
+        graph = DependencyGraph()
+        graph.add_dependency("2", "1")
+        graph.add_dependency("3", "2")
+        order = graph.topological_order()
+        self.assertLess(order.index("1"), order.index("2"))
+        self.assertLess(order.index("2"), order.index("3"))
+    
+    def test_reorders_when_edge_goes_against_order(self):
+        graph = DependencyGraph()
+        for node in ["a", "b", "c", "d"]:
+            graph.add_node(node)
+        graph.add_dependency("b", "d")
+        graph.add_dependency("a", "c")
+        graph.add_dependency("c", "b")
+        order = graph.topological_order()
+        self.assertLess(order.index("d"), order.index("b"))
+        self.assertLess(order.index("b"), order.index("c"))
+        self.assertLess(order.index("c"), order.index("a"))
+    
+    def test_cycle_is_rejected(self):
+        graph = DependencyGraph.from_tasks([
+            {"id": "1", "dependencies": ["2"]},
+            {"id": "2", "dependencies": ["3"]},
+            {"id": "3", "dependencies": []}
+        ])
+        self.assertTrue(graph.would_create_cycle("3", "1"))
+        with self.assertRaises(CircularDependencyError):
+            graph.add_dependency("3", "1")
+        with self.assertRaises(CircularDependencyError):
+            graph.add_dependency("1", "1")
+        self.assertNotIn("1", graph.predecessors["3"])
+        self.assertFalse(graph.would_create_cycle("1", "3"))
+    
+    def test_bulk_load_rejects_cycle(self):
+        with self.assertRaises(CircularDependencyError):
+            DependencyGraph.from_tasks([
+                {"id": "1", "dependencies": ["2"]},
+                {"id": "2", "dependencies": ["1"]}
+            ])
+    
+    def test_removed_edge_allows_reverse_dependency(self):
+        graph = DependencyGraph.from_tasks([
+            {"id": "1", "dependencies": ["2"]},
+            {"id": "2", "dependencies": []}
+        ])
+        graph.remove_dependency("1", "2")
+        graph.add_dependency("2", "1")
+        self.assertEqual(graph.predecessors["2"], {"1"})
+    
+    def test_agrees_with_full_scan(self):
+        import random
+        rng = random.Random(7)
+        graph = DependencyGraph()
+        deps = {str(i): [] for i in range(30)}
+        for node in deps:
+            graph.add_node(node)
+        for _ in range(200):
+            task_id, dep_id = rng.sample(sorted(deps), 2)
+            if dep_id in deps[task_id]:
+                continue
+            deps[task_id].append(dep_id)
+            tasks = [{"id": k, "dependencies": v} for k, v in deps.items()]
+            expected_cycle = detect_circular_dependencies(tasks)
+            if expected_cycle:
+                deps[task_id].remove(dep_id)
+            self.assertEqual(graph.would_create_cycle(task_id, dep_id), expected_cycle)
+            if not expected_cycle:
+                graph.add_dependency(task_id, dep_id)
+
+
+class SnapshotStoreTests(TestCase):
+    def test_pages_follow_cursor(self):
+        store = SnapshotStore()
+        snapshot_id, (tasks, cursor, total, metadata) = store.create(
+            list(range(5)), 2, strategy="smart_balance"
+        )
+        self.assertEqual(tasks, [0, 1])
+        self.assertEqual(total, 5)
+        self.assertEqual(metadata["strategy"], "smart_balance")
+        
+        pages = [tasks]
+        while cursor:
+            snapshot, offset = decode_cursor(cursor)
+            tasks, cursor, _, _ = store.page(snapshot, offset, 2)
+            pages.append(tasks)
+        self.assertEqual(pages, [[0, 1], [2, 3], [4]])
+    
+    def test_expired_snapshot_is_gone(self):
+        store = SnapshotStore(ttl=0)
+        snapshot_id, (tasks, _, _, _) = store.create([1, 2, 3], 10)
+        self.assertEqual(tasks, [1, 2, 3])
+        with self.assertRaises(SnapshotNotFound):
+            store.page(snapshot_id, 0, 10)
+    
+    def test_evicts_least_recently_used_over_budget(self):
+        store = SnapshotStore(max_tasks=5)
+        first, _ = store.create([1, 2], 1)
+        second, _ = store.create([3, 4], 1)
+        store.page(first, 0, 1)
+        store.create([5, 6], 1)
+        self.assertEqual(len(store), 2)
+        store.page(first, 0, 1)
+        with self.assertRaises(SnapshotNotFound):
+            store.page(second, 0, 1)
+        
+        # A snapshot over the whole budget is refused without evicting others
+        with self.assertRaises(SnapshotTooLarge):
+            store.create([1, 2, 3, 4, 5, 6], 1)
+        store.page(first, 0, 1)
+    
+    def test_invalid_cursor(self):
+        with self.assertRaises(SnapshotNotFound):
+            decode_cursor("not-a-cursor")
+
+
+class AnalyzePaginationTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.tasks = [
+            {
+                "id": str(i),
+                "title": f"Task {i}",
+                "due_date": (date.today() + timedelta(days=i)).isoformat(),
+                "estimated_hours": 1 + i,
+                "importance": 10 - i,
+                "dependencies": []
+            }
+            for i in range(5)
+        ]
+    
+    def test_analyze_without_page_size_returns_all(self):
+        response = self.client.post('/api/tasks/analyze/', self.tasks, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["tasks"]), 5)
+        self.assertNotIn("next_cursor", response.data)
+    
+    def test_pages_match_full_ranking(self):
+        full = self.client.post('/api/tasks/analyze/', self.tasks, format='json')
+        expected = [task["id"] for task in full.data["tasks"]]
+        
+        response = self.client.post('/api/tasks/analyze/?page_size=2', self.tasks, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_tasks"], 5)
+        ids = [task["id"] for task in response.data["tasks"]]
+        cursor = response.data["next_cursor"]
+        while cursor:
+            page = self.client.get('/api/tasks/analyze/page/', {"cursor": cursor, "page_size": 2})
+            self.assertEqual(page.status_code, 200)
+            ids.extend(task["id"] for task in page.data["tasks"])
+            cursor = page.data["next_cursor"]
+        self.assertEqual(ids, expected)
+    
+    def test_first_page_survives_immediate_expiry(self):
+        from unittest import mock
+        from . import views
+        with mock.patch.object(views, 'snapshot_store', SnapshotStore(ttl=0)):
+            response = self.client.post('/api/tasks/analyze/?page_size=2', self.tasks, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["tasks"]), 2)
+        page = self.client.get('/api/tasks/analyze/page/', {"cursor": response.data["next_cursor"]})
+        self.assertEqual(page.status_code, 404)
+    
+    def test_unknown_cursor(self):
+        response = self.client.get('/api/tasks/analyze/page/', {"cursor": "bWlzc2luZzow"})
+        self.assertEqual(response.status_code, 404)
+    
+    def test_invalid_page_size(self):
+        response = self.client.post('/api/tasks/analyze/?page_size=0', self.tasks, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ReachabilityIndexTests(TestCase):
+    def setUp(self):
+        # 1 <- 2 <- 3, 1 <- 4, 5 standalone
+        self.graph = DependencyGraph.from_tasks([
+            {"id": "1", "dependencies": []},
+            {"id": "2", "dependencies": ["1"]},
+            {"id": "3", "dependencies": ["2"]},
+            {"id": "4", "dependencies": ["1"]},
+            {"id": "5", "dependencies": []}
+        ])
+    
+    def test_transitive_blocked_counts(self):
+        index = ReachabilityIndex(self.graph)
+        self.assertEqual(index.blocked_count("1"), 3)
+        self.assertEqual(index.blocked_count("2"), 1)
+        self.assertEqual(index.blocked_count("3"), 0)
+        self.assertEqual(sorted(index.blocked_tasks("1")), ["2", "3", "4"])
+        self.assertEqual(index.blocked_tasks("5"), [])
+        blocked = index.blocked_tasks("1")
+        self.assertEqual(index.blocked_tasks("1", 1, 1), blocked[1:2])
+    
+    def test_top_unblockers(self):
+        index = ReachabilityIndex(self.graph)
+        self.assertEqual(index.top_unblockers(2), [("1", 3), ("2", 1)])
+    
+    def test_matches_brute_force(self):
+        import random
+        rng = random.Random(11)
+        tasks = [
+            {"id": str(i), "dependencies": [str(j) for j in rng.sample(range(i), min(i, 3))]}
+            for i in range(60)
+        ]
+        rng.shuffle(tasks)
+        graph = DependencyGraph.from_tasks(tasks)
+        index = ReachabilityIndex(graph)
+        for node in graph.order:
+            seen, stack = set(), [node]
+            while stack:
+                for succ in graph.successors[stack.pop()]:
+                    if succ not in seen:
+                        seen.add(succ)
+                        stack.append(succ)
+            self.assertEqual(set(index.blocked_tasks(node)), seen)
+            self.assertEqual(index.blocked_count(node), len(seen))
+            blocked = index.blocked_tasks(node)
+            self.assertEqual(index.blocked_tasks(node, 2, 3), blocked[2:5])
+    
+    def test_chain_closures_are_stored_as_runs(self):
+        size = 2000
+        tasks = [{"id": str(i), "dependencies": [str(i - 1)] if i else []} for i in range(size)]
+        index = ReachabilityIndex(DependencyGraph.from_tasks(tasks))
+        self.assertEqual(index.blocked_count("0"), size - 1)
+        self.assertEqual(index.blocked_tasks("0", 10, 2), ["11", "12"])
+        # At most two 32-bit bounds per closure instead of up to size bits
+        self.assertLessEqual(index.nbytes, 8 * (size - 1))
+    
+    def test_cache_is_bounded_by_size(self):
+        from .graph import ReachabilityIndexCache
+        cache = ReachabilityIndexCache(max_bytes=100)
+        cache.put("a", "A", 60)
+        cache.put("b", "B", 30)
+        cache.get("a")
+        cache.put("c", "C", 40)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "A")
+        cache.put("big", "BIG", 101)
+        self.assertIsNone(cache.get("big"))
+        self.assertEqual(cache.get("c"), "C")
+    
+    def test_blocking_endpoint(self):
+        from rest_framework.test import APIClient
+        tasks = [
+            {"id": "1", "title": "Design", "dependencies": []},
+            {"id": "2", "title": "Build", "dependencies": ["1", "missing"]},
+            {"id": "3", "title": "Ship", "dependencies": ["2"]}
+        ]
+        response = APIClient().post('/api/tasks/blocking/?task=1', tasks, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("blocked_counts", response.data)
+        self.assertEqual(response.data["unblockers"][0]["title"], "Design")
+        self.assertEqual(response.data["blocked_count"], 2)
+        self.assertEqual(response.data["blocked_tasks"], ["2", "3"])
+        
+        # Follow-up queries reuse the cached index
+        index_id = response.data["index_id"]
+        page = APIClient().get(f'/api/tasks/blocking/{index_id}/', {
+            "counts": "true", "counts_page_size": 2, "task": "1", "tasks_offset": 1
+        })
+        self.assertEqual(page.data["blocked_counts"], {"1": 2, "2": 1})
+        self.assertEqual(page.data["counts_next_offset"], 2)
+        self.assertEqual(page.data["blocked_tasks"], ["3"])
+        self.assertIsNone(page.data["tasks_next_offset"])
+        page = APIClient().get(f'/api/tasks/blocking/{index_id}/', {"counts": "true", "counts_offset": 2})
+        self.assertEqual(page.data["blocked_counts"], {"3": 0})
+        self.assertIsNone(page.data["counts_next_offset"])
+        self.assertEqual(APIClient().get('/api/tasks/blocking/missing/').status_code, 404)
+        unknown = APIClient().get(f'/api/tasks/blocking/{index_id}/', {"task": "missing"})
+        self.assertEqual(unknown.status_code, 404)
+        
+        from . import views
+        cached = views.reachability_cache.get(index_id)
+        APIClient().post('/api/tasks/blocking/', tasks, format='json')
+        self.assertIs(views.reachability_cache.get(index_id), cached)
+        
+        tasks[0]["dependencies"] = ["3"]
+        response = APIClient().post('/api/tasks/blocking/', tasks, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class _ExitOnUnpickle:
+    """Kills the worker process that unpickles it"""
+    
+    def __reduce__(self):
+        return (os._exit, (1,))
+
+
+class AnalysisJobTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from concurrent.futures import ThreadPoolExecutor
+        from . import jobs
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.queue = jobs.JobQueue(self.tmpdir.name, executor_class=ThreadPoolExecutor)
+        jobs._job_queue = self.queue
+        self.tasks = [
+            {
+                "id": str(i),
+                "title": f"Task {i}",
+                "due_date": (date.today() + timedelta(days=i)).isoformat(),
+                "estimated_hours": 1 + i,
+                "importance": 10 - i,
+                "dependencies": [str(i - 1)] if i else []
+            }
+            for i in range(5)
+        ]
+    
+    def tearDown(self):
+        from . import jobs
+        self.queue.shutdown()
+        jobs._job_queue = None
+        self.tmpdir.cleanup()
+    
+    def test_job_result_matches_sync_analysis(self):
+        import copy
+        from rest_framework.test import APIClient
+        client = APIClient()
+        expected = client.post(
+            '/api/tasks/analyze/?strategy=high_impact', copy.deepcopy(self.tasks), format='json'
+        ).data
+        
+        response = client.post('/api/tasks/jobs/?strategy=high_impact', self.tasks, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data["id"]
+        self.assertEqual(self.queue.wait(job_id, timeout=10)["status"], "completed")
+        
+        status_response = client.get(f'/api/tasks/jobs/{job_id}/')
+        self.assertEqual(status_response.data["progress"], 5)
+        result = self._streamed_result(client, job_id)
+        self.assertEqual(result["strategy_used"], "high_impact")
+        self.assertEqual(result["total_tasks"], 5)
+        self.assertEqual(
+            [(task["id"], task["priority_score"]) for task in result["tasks"]],
+            [(task["id"], task["priority_score"]) for task in expected["tasks"]]
+        )
+        
+        ids = []
+        params = {"page_size": 2}
+        while True:
+            page = client.get(f'/api/tasks/jobs/{job_id}/result/', params).data
+            ids.extend(task["id"] for task in page["tasks"])
+            if page["next_cursor"] is None:
+                break
+            params = {"page_size": 2, "cursor": page["next_cursor"]}
+        self.assertEqual(ids, [task["id"] for task in expected["tasks"]])
+    
+    def _streamed_result(self, client, job_id):
+        import json
+        response = client.get(f'/api/tasks/jobs/{job_id}/result/')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b"".join(response.streaming_content))
+    
+    def _parse_dates(self):
+        for task in self.tasks:
+            task["due_date"] = date.fromisoformat(task["due_date"])
+    
+    def test_result_pages_span_chunks(self):
+        from unittest import mock
+        from . import jobs
+        self._parse_dates()
+        with mock.patch.object(jobs, 'RESULT_CHUNK_SIZE', 2):
+            job = self.queue.submit(self.tasks, "smart_balance")
+            self.queue.wait(job["id"], timeout=10)
+        tasks, total, _ = self.queue.result_page(job["id"], 0, 5)
+        self.assertEqual(total, 5)
+        self.assertEqual(self.queue.result_page(job["id"], 1, 3)[0], tasks[1:4])
+        self.assertEqual(self.queue.result_page(job["id"], 4, 3)[0], tasks[4:])
+        self.assertEqual(self._streamed_result(self.client, job["id"])["tasks"], tasks)
+        
+        response = self.client.get(f'/api/tasks/jobs/{job["id"]}/result/', {"cursor": "bWlzc2luZzow"})
+        self.assertEqual(response.status_code, 400)
+        
+        self.queue.store.delete(job["id"])
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+    
+    def test_large_analysis_runs_in_background(self):
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        with override_settings(TASK_JOB_SYNC_LIMIT=3):
+            response = APIClient().post('/api/tasks/analyze/', self.tasks, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["total"], 5)
+    
+    def test_cycle_fails_job(self):
+        self.tasks[0]["dependencies"] = ["4"]
+        self._parse_dates()
+        job = self.queue.submit(self.tasks, "smart_balance")
+        job = self.queue.wait(job["id"], timeout=10)
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("Circular", job["error"])
+    
+    def test_cancel_stops_running_job(self):
+        from . import jobs
+        store = self.queue.store
+        store.create("abc", total=5)
+        store.request_cancel("abc")
+        jobs.run_analysis_job(store.directory, "abc", [], "smart_balance")
+        self.assertEqual(store.get("abc")["status"], "cancelled")
+        
+        response = self.client.delete('/api/tasks/jobs/abc/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "cancelled")
+        result = self.client.get('/api/tasks/jobs/abc/result/')
+        self.assertEqual(result.status_code, 409)
+    
+    def test_cancel_while_scoring(self):
+        import threading
+        from unittest import mock
+        from . import scoring
+        self._parse_dates()
+        started, release = threading.Event(), threading.Event()
+        score = scoring.TaskScorer.calculate_total_score
+        
+        def slow_score(scorer, *args, **kwargs):
+            started.set()
+            release.wait(10)
+            return score(scorer, *args, **kwargs)
+        
+        with mock.patch.object(scoring, 'PROGRESS_INTERVAL_SECONDS', 0), \
+                mock.patch.object(scoring.TaskScorer, 'calculate_total_score', slow_score):
+            job = self.queue.submit(self.tasks, "smart_balance")
+            self.assertTrue(started.wait(10))
+            running = self.client.get(f'/api/tasks/jobs/{job["id"]}/').data
+            self.assertEqual((running["status"], running["phase"]), ("running", "scoring"))
+            self.assertEqual(self.client.delete(f'/api/tasks/jobs/{job["id"]}/').status_code, 200)
+            release.set()
+            job = self.queue.wait(job["id"], timeout=10)
+        self.assertEqual(job["status"], "cancelled")
+        self.assertEqual(job["phase"], "scoring")
+        self.assertLess(job["progress"], 5)
+    
+    def test_final_status_is_written_once(self):
+        from . import jobs
+        store = self.queue.store
+        self.queue.result_ttl = 60
+        store.create("abc", created_at=0)
+        self.assertEqual(self.queue.status("abc")["status"], "failed")
+        
+        # Neither a late cancel nor the worker can overwrite the outcome
+        self.assertEqual(self.queue.cancel("abc")["status"], "failed")
+        jobs.run_analysis_job(store.directory, "abc", self.tasks, "smart_balance")
+        job = store.get("abc")
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("did not finish", job["error"])
+    
+    def test_process_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+        from . import jobs
+        queue = jobs.JobQueue(self.tmpdir.name, max_workers=1, executor_class=ProcessPoolExecutor)
+        self.addCleanup(queue.shutdown)
+        self._parse_dates()
+        job = queue.submit(self.tasks, "smart_balance")
+        self.assertEqual(queue.wait(job["id"], timeout=60)["status"], "completed")
+        tasks, total, _ = queue.result_page(job["id"], 0, 10)
+        self.assertEqual(total, 5)
+        self.assertEqual(tasks[0]["due_date"], self.tasks[0]["due_date"].isoformat())
+        
+        # A worker that dies fails its job, and the pool is replaced
+        executor = queue._get_executor()
+        job = queue.submit([{"id": "1", "payload": _ExitOnUnpickle()}], "smart_balance")
+        job = queue.wait(job["id"], timeout=60)
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("Worker failed", job["error"])
+        job = queue.submit(self.tasks, "smart_balance")
+        self.assertEqual(queue.wait(job["id"], timeout=60)["status"], "completed")
+        self.assertIsNot(queue._get_executor(), executor)
+    
+    def test_worker_exception_fails_job(self):
+        from unittest import mock
+        from concurrent.futures.process import BrokenProcessPool
+        from . import jobs
+        executor = self.queue._get_executor()
+        with mock.patch.object(jobs, 'run_analysis_job', side_effect=BrokenProcessPool("worker died")):
+            job = self.queue.submit([], "smart_balance")
+            job = self.queue.wait(job["id"], timeout=10)
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("worker died", job["error"])
+        
+        # The broken pool is replaced for the next submission
+        job = self.queue.submit([], "smart_balance")
+        self.assertEqual(self.queue.wait(job["id"], timeout=10)["status"], "completed")
+        self.assertIsNot(self.queue._get_executor(), executor)
+    
+    def test_unfinished_jobs_fail_after_ttl(self):
+        self.queue.result_ttl = 60
+        self.queue.store.create("abc", status="running", created_at=0)
+        job = self.client.get('/api/tasks/jobs/abc/').data
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("did not finish", job["error"])
+    
+    def test_deep_chain_is_analyzed_synchronously(self):
+        from rest_framework.test import APIClient
+        tasks = [
+            {
+                "id": str(i), "title": f"Task {i}", "due_date": date.today().isoformat(),
+                "estimated_hours": 1, "importance": 5,
+                "dependencies": [str(i - 1)] if i else []
+            }
+            for i in range(2000)
+        ]
+        response = APIClient().post('/api/tasks/analyze/', tasks, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_tasks"], 2000)
+    
+    def test_finished_jobs_expire(self):
+        self.queue.result_ttl = 0
+        self.queue.store.create("abc")
+        self.queue.store.finish("abc", "completed")
+        self.assertEqual(self.client.get('/api/tasks/jobs/abc/').status_code, 404)
+        self.assertEqual(self.client.get('/api/tasks/jobs/not-a-job/').status_code, 404)
@@ -3,7 +3,13 @@ from . import views
 
 urlpatterns = [
     path('tasks/analyze/', views.analyze_tasks, name='analyze-tasks'),
+    path('tasks/analyze/page/', views.analysis_page, name='analysis-page'),
+    path('tasks/jobs/', views.submit_analysis_job, name='submit-analysis-job'),
+    path('tasks/jobs/<str:job_id>/', views.analysis_job, name='analysis-job'),
+    path('tasks/jobs/<str:job_id>/result/', views.analysis_job_result, name='analysis-job-result'),
     path('tasks/suggest/', views.suggest_tasks, name='suggest-tasks'),
     path('tasks/eisenhower/', views.eisenhower_matrix, name='eisenhower-matrix'),
     path('tasks/dependency-graph/', views.dependency_graph, name='dependency-graph'),
+    path('tasks/blocking/', views.blocking_analysis, name='blocking-analysis'),
+    path('tasks/blocking/<str:index_id>/', views.blocking_query, name='blocking-query'),
 ]
\ No newline at end of file
@@ -3,10 +3,56 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.core.exceptions import ValidationError
-from .scoring import TaskScorer, detect_circular_dependencies
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from .scoring import TaskScorer, VALID_STRATEGIES, rank_tasks
+from .graph import CircularDependencyError, DependencyGraph, ReachabilityIndex, ReachabilityIndexCache
 from .serializers import TaskSerializer
+from .snapshots import SnapshotNotFound, SnapshotTooLarge, decode_cursor, encode_cursor, snapshot_store
+from .jobs import COMPLETED, JobNotFound, get_job_queue
+import hashlib
 import json
 
+MAX_PAGE_SIZE = 500
+
+reachability_cache = ReachabilityIndexCache(
+    getattr(settings, 'TASK_REACHABILITY_CACHE_BYTES', 64 * 1024 * 1024)
+)
+
+def _parse_page_size(value):
+    page_size = int(value)
+    if page_size < 1:
+        raise ValueError("page_size must be positive")
+    return min(page_size, MAX_PAGE_SIZE)
+
+def _paginated_response(snapshot_id, offset, page):
+    tasks, next_cursor, total, metadata = page
+    return Response({
+        "strategy_used": metadata["strategy"],
+        "snapshot_id": snapshot_id,
+        "tasks": tasks,
+        "total_tasks": total,
+        "offset": offset,
+        "next_cursor": next_cursor
+    })
+
+def _prepare_tasks(tasks_data):
+    """Validate required fields and parse due dates; returns an error message"""
+    for task in tasks_data:
+        if not all(key in task for key in ['title', 'due_date', 'estimated_hours', 'importance']):
+            return "Each task must have title, due_date, estimated_hours, and importance"
+        
+        # Convert due_date string to date object if needed
+        if isinstance(task['due_date'], str):
+            task['due_date'] = date.fromisoformat(task['due_date'])
+    return None
+
+def _get_strategy(request):
+    strategy = request.query_params.get('strategy', 'smart_balance')
+    if strategy not in VALID_STRATEGIES:
+        strategy = 'smart_balance'
+    return strategy
+
 @api_view(['POST'])
 def analyze_tasks(request):
     """
@@ -22,44 +68,48 @@ def analyze_tasks(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Validate required fields and data types
-        for task in tasks_data:
-            if not all(key in task for key in ['title', 'due_date', 'estimated_hours', 'importance']):
+        page_size = None
+        if 'page_size' in request.query_params:
+            try:
+                page_size = _parse_page_size(request.query_params['page_size'])
+            except ValueError:
                 return Response(
-                    {"error": "Each task must have title, due_date, estimated_hours, and importance"},
+                    {"error": "page_size must be a positive integer"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
-            # Convert due_date string to date object if needed
-            if isinstance(task['due_date'], str):
-                task['due_date'] = date.fromisoformat(task['due_date'])
         
-        # Check for circular dependencies
-        if detect_circular_dependencies(tasks_data):
+        error = _prepare_tasks(tasks_data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Get scoring strategy from request (the body is the task list)
+        strategy = _get_strategy(request)
+        
+        # Large analyses run in the background; the client polls the job
+        sync_limit = getattr(settings, 'TASK_JOB_SYNC_LIMIT', 20000)
+        if len(tasks_data) > sync_limit or request.query_params.get('background') == 'true':
+            job = get_job_queue().submit(tasks_data, strategy)
+            return Response(job, status=status.HTTP_202_ACCEPTED)
+        
+        # Check for circular dependencies (iteratively, so deep chains
+        # cannot hit the recursion limit)
+        try:
+            DependencyGraph.from_tasks(tasks_data)
+        except CircularDependencyError:
             return Response(
                 {"error": "Circular dependencies detected in tasks"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get scoring strategy from request
-        strategy = request.data.get('strategy', 'smart_balance')
-        valid_strategies = ['smart_balance', 'fastest_wins', 'high_impact', 'deadline_driven']
-        if strategy not in valid_strategies:
-            strategy = 'smart_balance'
+        sorted_tasks = rank_tasks(tasks_data, strategy)
         
-        # Initialize scorer and calculate scores
-        scorer = TaskScorer(strategy)
-        today = date.today()
-        
-        scored_tasks = []
-        for task in tasks_data:
-            score, explanation = scorer.calculate_total_score(task, tasks_data, today)
-            task['priority_score'] = score
-            task['explanation'] = explanation
-            scored_tasks.append(task)
-        
-        # Sort tasks by priority score (descending)
-        sorted_tasks = sorted(scored_tasks, key=lambda x: x['priority_score'], reverse=True)
+        # With page_size, store the ranking and return only the first page
+        if page_size is not None:
+            try:
+                snapshot_id, page = snapshot_store.create(sorted_tasks, page_size, strategy=strategy)
+                return _paginated_response(snapshot_id, 0, page)
+            except SnapshotTooLarge:
+                pass  # Larger than the whole store; return it unpaged
         
         return Response({
             "strategy_used": strategy,
@@ -78,6 +128,36 @@ def analyze_tasks(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET'])
+def analysis_page(request):
+    """
+    Fetch the next page of a stored analysis by cursor, without rescoring
+    """
+    cursor = request.query_params.get('cursor')
+    if not cursor:
+        return Response(
+            {"error": "cursor is required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        page_size = _parse_page_size(request.query_params.get('page_size', 50))
+    except ValueError:
+        return Response(
+            {"error": "page_size must be a positive integer"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        snapshot_id, offset = decode_cursor(cursor)
+        page = snapshot_store.page(snapshot_id, offset, page_size)
+        return _paginated_response(snapshot_id, offset, page)
+    except SnapshotNotFound as e:
+        return Response(
+            {"error": f"{str(e)}. Re-run the analysis."},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
 @api_view(['GET'])
 def suggest_tasks(request):
     """
@@ -260,4 +340,227 @@ def dependency_graph(request):
         return Response(
             {"error": f"Graph generation failed: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+def _parse_offset_page(request, prefix):
+    offset = int(request.query_params.get(f'{prefix}_offset', 0))
+    page_size = _parse_page_size(request.query_params.get(f'{prefix}_page_size', MAX_PAGE_SIZE))
+    if offset < 0:
+        raise ValueError("offset must not be negative")
+    return offset, page_size
+
+def _blocking_response(index_id, index, titles, request):
+    """
+    Answer blocking queries from a built index; nothing is recomputed.
+    The count map and a task's blocked list are paged independently with
+    counts_offset/counts_page_size and tasks_offset/tasks_page_size.
+    """
+    try:
+        limit = int(request.query_params.get('limit', 10))
+        counts_offset, counts_page_size = _parse_offset_page(request, 'counts')
+        tasks_offset, tasks_page_size = _parse_offset_page(request, 'tasks')
+        if limit < 0:
+            raise ValueError("limit must not be negative")
+    except ValueError:
+        return Response(
+            {"error": "limit, offsets and page sizes must be positive integers"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    task_id = request.query_params.get('task')
+    if task_id is not None and task_id not in index.position:
+        return Response(
+            {"error": f"Unknown task: {task_id}"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    response = {
+        "index_id": index_id,
+        "total_tasks": len(index.nodes),
+        "unblockers": [
+            {"id": node, "title": titles[node], "blocked_count": count}
+            for node, count in index.top_unblockers(limit)
+        ]
+    }
+    
+    # The full count map is large for big graphs, so it is opt-in and paged
+    if request.query_params.get('counts') == 'true':
+        end = counts_offset + counts_page_size
+        nodes = index.nodes[counts_offset:end]
+        response["blocked_counts"] = {node: index.blocked_count(node) for node in nodes}
+        response["counts_next_offset"] = end if end < len(index.nodes) else None
+    
+    if task_id is not None:
+        end = tasks_offset + tasks_page_size
+        response["blocked_count"] = index.blocked_count(task_id)
+        response["blocked_tasks"] = index.blocked_tasks(task_id, tasks_offset, tasks_page_size)
+        response["tasks_next_offset"] = end if end < response["blocked_count"] else None
+    
+    return Response(response)
+
+@api_view(['POST'])
+def blocking_analysis(request):
+    """
+    Count how many tasks each task transitively blocks and rank the tasks
+    whose completion unblocks the most work. The built index is cached, so
+    follow-up queries can use GET tasks/blocking/<index_id>/.
+    """
+    try:
+        tasks_data = request.data
+        
+        if not isinstance(tasks_data, list):
+            return Response(
+                {"error": "Expected a list of tasks"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Dependencies on unknown tasks are ignored, as in cycle detection
+        task_ids = {str(task['id']) for task in tasks_data}
+        titles = {str(task['id']): task.get('title', '') for task in tasks_data}
+        graph_tasks = [
+            {
+                "id": str(task['id']),
+                "dependencies": [str(dep) for dep in task.get('dependencies', []) if str(dep) in task_ids]
+            }
+            for task in tasks_data
+        ]
+        
+        index_id = hashlib.sha256(
+            json.dumps([graph_tasks, titles], sort_keys=True).encode()
+        ).hexdigest()[:32]
+        cached = reachability_cache.get(index_id)
+        if cached is None:
+            try:
+                index = ReachabilityIndex(DependencyGraph.from_tasks(graph_tasks))
+            except CircularDependencyError:
+                return Response(
+                    {"error": "Circular dependencies detected in tasks"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            cached = (index, titles)
+            reachability_cache.put(index_id, cached, index.nbytes)
+        
+        return _blocking_response(index_id, cached[0], cached[1], request)
+        
+    except KeyError as e:
+        return Response(
+            {"error": f"Each task must have {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        return Response(
+            {"error": f"Blocking analysis failed: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+def blocking_query(request, index_id):
+    """
+    Query a previously built blocking index without re-sending the tasks
+    """
+    cached = reachability_cache.get(index_id)
+    if cached is None:
+        return Response(
+            {"error": "Index not found or evicted. Re-post the tasks."},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return _blocking_response(index_id, cached[0], cached[1], request)
+
+
+@api_view(['POST'])
+def submit_analysis_job(request):
+    """
+    Queue an analysis to run in the background, regardless of its size
+    """
+    try:
+        tasks_data = request.data
+        
+        if not isinstance(tasks_data, list):
+            return Response(
+                {"error": "Expected a list of tasks"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        error = _prepare_tasks(tasks_data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        job = get_job_queue().submit(tasks_data, _get_strategy(request))
+        return Response(job, status=status.HTTP_202_ACCEPTED)
+        
+    except ValueError as e:
+        return Response(
+            {"error": f"Invalid date format: {str(e)}. Use YYYY-MM-DD format."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        return Response(
+            {"error": f"Job submission failed: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET', 'DELETE'])
+def analysis_job(request, job_id):
+    """
+    Poll a background analysis for status and progress, or cancel it
+    """
+    try:
+        queue = get_job_queue()
+        if request.method == 'DELETE':
+            return Response(queue.cancel(job_id))
+        return Response(queue.status(job_id))
+    except JobNotFound as e:
+        return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+@api_view(['GET'])
+def analysis_job_result(request, job_id):
+    """
+    Fetch the ranked result of a completed background analysis. With
+    page_size or cursor, one page is read from the stored result chunks;
+    otherwise the whole result is streamed.
+    """
+    queue = get_job_queue()
+    try:
+        job = queue.status(job_id)
+        if job['status'] != COMPLETED:
+            return Response(
+                {"error": f"Job is {job['status']}", "job": job},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        if 'page_size' not in request.query_params and 'cursor' not in request.query_params:
+            return StreamingHttpResponse(queue.iter_result(job_id), content_type='application/json')
+        
+        try:
+            page_size = _parse_page_size(request.query_params.get('page_size', 50))
+        except ValueError:
+            return Response(
+                {"error": "page_size must be a positive integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        offset = 0
+        if 'cursor' in request.query_params:
+            try:
+                cursor_job_id, offset = decode_cursor(request.query_params['cursor'])
+            except SnapshotNotFound:
+                cursor_job_id = None
+            if cursor_job_id != job_id:
+                return Response(
+                    {"error": "Invalid cursor"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        tasks, total, metadata = queue.result_page(job_id, offset, page_size)
+    except JobNotFound as e:
+        return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    
+    end = offset + page_size
+    return Response({
+        "strategy_used": metadata["strategy_used"],
+        "job_id": job_id,
+        "tasks": tasks,
+        "total_tasks": total,
+        "offset": offset,
+        "next_cursor": encode_cursor(job_id, end) if end < total else None
+    })
@@ -2,6 +2,10 @@
 let tasks = [];
 let currentTaskId = 1;
 let graphData = null;
+let nextResultsCursor = null;
+let resultsPageUrl = '/api/tasks/analyze/page/';
+const RESULTS_PAGE_SIZE = 50;
+const JOB_POLL_INTERVAL_MS = 1000;
 
 // DOM Elements
 const taskList = document.getElementById('taskList');
@@ -265,7 +269,8 @@ async function analyzeTasks() {
     try {
         const strategy = strategySelect.value;
         
-        const response = await fetch('/api/tasks/analyze/', {
+        const params = new URLSearchParams({ strategy, page_size: RESULTS_PAGE_SIZE });
+        const response = await fetch(`/api/tasks/analyze/?${params}`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -273,13 +278,21 @@ async function analyzeTasks() {
             body: JSON.stringify(tasks)
         });
 
-        const data = await response.json();
+        let data = await response.json();
 
         if (!response.ok) {
             throw new Error(data.error || 'Analysis failed');
         }
 
+        // Large analyses are queued as a background job
+        if (response.status === 202) {
+            data = await waitForAnalysisJob(data.id);
+        }
+
         displayResults(data.tasks, data.strategy_used);
+        // Job results are paged from the job, not the in-memory snapshots
+        resultsPageUrl = data.job_id ? `/api/tasks/jobs/${data.job_id}/result/` : '/api/tasks/analyze/page/';
+        updateResultsCursor(data.next_cursor);
         
     } catch (error) {
         showError('Analysis failed: ' + error.message);
@@ -288,6 +301,67 @@ async function analyzeTasks() {
     }
 }
 
+// Poll a background analysis until it finishes, then fetch its first page
+async function waitForAnalysisJob(jobId) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+
+        const response = await fetch(`/api/tasks/jobs/${jobId}/`);
+        const job = await response.json();
+
+        if (!response.ok) {
+            throw new Error(job.error || 'Analysis job failed');
+        }
+        if (job.status === 'failed' || job.status === 'cancelled') {
+            throw new Error(job.error || `Analysis job ${job.status}`);
+        }
+        if (job.status === 'completed') {
+            break;
+        }
+        const phase = job.phase === 'scoring' ? `${job.progress}/${job.total} tasks scored` : (job.phase || job.status);
+        showTemporaryMessage(`Analyzing... ${phase}`, 'success');
+    }
+
+    const response = await fetch(`/api/tasks/jobs/${jobId}/result/?page_size=${RESULTS_PAGE_SIZE}`);
+    const data = await response.json();
+
+    if (!response.ok) {
+        throw new Error(data.error || 'Failed to fetch analysis results');
+    }
+    return data;
+}
+
+// Fetch the next page of the stored analysis
+async function loadMoreResults() {
+    if (!nextResultsCursor) return;
+
+    showLoading();
+    hideError();
+
+    try {
+        const params = new URLSearchParams({ cursor: nextResultsCursor, page_size: RESULTS_PAGE_SIZE });
+        const response = await fetch(`${resultsPageUrl}?${params}`);
+        const data = await response.json();
+
+        if (!response.ok) {
+            throw new Error(data.error || 'Failed to load more results');
+        }
+
+        displayResults(data.tasks, data.strategy_used, data.offset);
+        updateResultsCursor(data.next_cursor);
+        
+    } catch (error) {
+        showError('Failed to load more results: ' + error.message);
+    } finally {
+        hideLoading();
+    }
+}
+
+function updateResultsCursor(cursor) {
+    nextResultsCursor = cursor;
+    document.getElementById('loadMoreResults').classList.toggle('hidden', !cursor);
+}
+
 // Get task suggestions
 async function getSuggestions() {
     showLoading();
@@ -313,9 +387,11 @@ async function getSuggestions() {
 }
 
 // Display analysis results
-function displayResults(scoredTasks, strategy) {
+function displayResults(scoredTasks, strategy, offset = 0) {
     const resultList = document.getElementById('resultList');
-    resultList.innerHTML = '';
+    if (offset === 0) {
+        resultList.innerHTML = '';
+    }
 
     scoredTasks.forEach((task, index) => {
         const priorityClass = getPriorityClass(task.priority_score);
@@ -325,7 +401,7 @@ function displayResults(scoredTasks, strategy) {
         taskElement.className = `priority-task ${priorityClass}`;
         taskElement.innerHTML = `
             <div class="task-header">
-                <h4>${index + 1}. ${task.title}</h4>
+                <h4>${offset + index + 1}. ${task.title}</h4>
                 <div class="task-score ${scoreClass}">${task.priority_score.toFixed(3)}</div>
             </div>
             <div class="task-explanation">${task.explanation}</div>